@@ -1,16 +1,36 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, ConfigDict, Field
+from fastapi.responses import StreamingResponse
 import google.generativeai as genai
 from dotenv import load_dotenv
 import json
-import requests
+import orjson
 import math
+import numpy as np
+import aiohttp
+from cachetools import TTLCache
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 from urllib.parse import quote
+from types import MappingProxyType
+from string import Template
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Close the shared HTTP session and Redis client on shutdown
+    if http_session is not None and not http_session.closed:
+        await http_session.close()
+    if redis_client is not None:
+        await redis_client.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend to communicate with backend
 app.add_middleware(
@@ -21,25 +41,134 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses, including the streamed NDJSON from /analyze-area
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 model = genai.GenerativeModel('gemini-2.0-flash-thinking-exp')
 
-def get_pois_overpass(area_name, city_name, poi_categories):
+# Amenity types searched for around each area
+POI_CATEGORIES = (
+    "school", "hospital", "pharmacy", "supermarket", "grocery",
+    "restaurant", "cafe", "bar", "pub", "bus_stop", "train_station",
+    "park", "playground", "bank", "atm", "post_office"
+)
+
+# Categories that are mapped as single points, so ways/relations needn't be searched
+NODE_ONLY_CATEGORIES = frozenset({"atm", "bus_stop"})
+
+# Cap on POIs returned per category, to bound the Overpass response size
+MAX_POIS_PER_CATEGORY = 200
+
+# Prompt for the area analysis; $area is "area, city" and $pois the POI summary JSON
+ANALYSIS_PROMPT_TEMPLATE = Template("""You are a expert location analyser for people to move in there. Analyze the living potential of $area based on these categorized Points of Interest (POIs):
+$pois
+Focus on the following aspects which are important for living standards and dont be strict whatever data you get analyze that and provide your opnion and analysis based on that.
+
+Provide a structured JSON response with the following keys:
+- "summary":(in simple text) A concise summary of the living potential of the area, highlighting the strengths and weaknesses in each category.
+- "pie_chart_data": Data suitable for a pie chart visualizing the distribution of POI types. Include "name" and "value" for each category. Example: [{"name": "Residential", "value": 30}, {"name": "Commercial", "value": 70}]
+- "ai_rating": A numerical rating from 0 to 100 representing how well this area functions as a "15-minute city" where residents can access most daily needs within a 15-minute walk or bike ride.
+
+IMPORTANT: Only return the raw JSON, no additional text or explanations. The response must start with '{' and end with '}'.""")
+
+# Map marker color for each POI category (read-only, shared across requests)
+COLORS_BY_CATEGORY = MappingProxyType({
+    "hospital": "#0088FE",
+    "school": "#00C49F",
+    "pharmacy": "#FFBB28",
+    "restaurant": "#FF8042",
+    "cafe": "#AF19FF",
+    "bank": "#FF1919",
+    "atm": "#17BECF",
+    "supermarket": "#9467BD",
+    "grocery": "#D62728",
+    "bus_stop": "#2CA02C",
+    "train_station": "#E377C2",
+    "park": "#7F7F7F",
+    "playground": "#BCBD22",
+    "post_office": "#8C564B"
+})
+DEFAULT_POI_COLOR = "#000000"
+
+# Palette cycled through by category in create_basic_geojson
+CATEGORY_PALETTE = ("#0088FE", "#00C49F", "#FFBB28", "#FF8042", "#AF19FF", "#FF1919")
+
+# Shared aiohttp session, created lazily on first use and closed on shutdown
+http_session = None
+
+def get_http_session():
+    """Return the shared aiohttp session, creating it if needed."""
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(
+            headers={'User-Agent': 'MapMind/1.0'},
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        )
+    return http_session
+
+# Optional Redis cache for full analysis results, enabled when REDIS_URL is set
+ANALYSIS_CACHE_TTL = 86400  # 1 day
+redis_client = aioredis.from_url(os.getenv("REDIS_URL")) if os.getenv("REDIS_URL") else None
+
+async def get_cached_analysis(cache_key):
+    """Return the cached NDJSON analysis stream for a key, or None on a miss or cache failure."""
+    if redis_client is None:
+        return None
+    try:
+        return await redis_client.get(cache_key)
+    except RedisError as e:
+        print(f"Cache Error: {str(e)}")
+        return None
+
+async def cache_analysis(cache_key, stream_body):
+    """Store an analysis NDJSON stream; cache failures are logged and otherwise ignored."""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(cache_key, ANALYSIS_CACHE_TTL, stream_body)
+    except RedisError as e:
+        print(f"Cache Error: {str(e)}")
+
+# Reused to pull the first JSON object out of free-form LLM output
+JSON_DECODER = json.JSONDecoder()
+
+async def generate_analysis_text(prompt):
+    """Run the analysis prompt through Gemini, streaming and accumulating the response text."""
+    response = await model.generate_content_async(prompt, stream=True)
+    return "".join([chunk.text async for chunk in response])
+
+# Nominatim results keyed by the normalized "area, city" query
+geocode_cache = TTLCache(maxsize=10000, ttl=86400)
+
+async def geocode_area(area_name, city_name):
+    """Geocode an area/city pair with Nominatim, caching results by the normalized query."""
+    geocode_query = f"{area_name.lower().strip()}, {city_name.lower().strip()}"
+    if geocode_query in geocode_cache:
+        return geocode_cache[geocode_query]
+
+    geocode_url = f"https://nominatim.openstreetmap.org/search?q={quote(geocode_query)}&format=json&limit=1"
+    async with get_http_session().get(geocode_url) as geocode_response:
+        geocode_response.raise_for_status()
+        geocode_data = orjson.loads(await geocode_response.read())
+
+    # Don't cache misses, so a transiently empty answer isn't pinned for a day
+    if geocode_data:
+        geocode_cache[geocode_query] = geocode_data
+    return geocode_data
+
+async def get_pois_overpass(area_name, city_name, poi_categories):
     """Get POIs using Overpass API for multiple categories within a 1km radius."""
     overpass_url = "https://overpass-api.de/api/interpreter"
 
     # --- 1. Define Search Area ---
-    geocode_query = f"{area_name}, {city_name}"
-    geocode_url = f"https://nominatim.openstreetmap.org/search?q={quote(geocode_query)}&format=json&limit=1"
     try:
-        geocode_response = requests.get(geocode_url, headers={'User-Agent': 'MapMind/1.0'})
-        geocode_response.raise_for_status()
-        geocode_data = geocode_response.json()
-    except requests.RequestException as e:
+        geocode_data = await geocode_area(area_name, city_name)
+    except aiohttp.ClientError as e:
         print(f"Geocoding Error: {str(e)}")
         return {"error": f"Geocoding failed: {str(e)}"}
-    except json.JSONDecodeError:
-        print(f"Geocoding JSON Error: {geocode_response.text}")
+    except orjson.JSONDecodeError:
+        print("Geocoding JSON Error")
         return {"error": "Error decoding geocoding JSON response"}
 
     if not geocode_data:
@@ -70,57 +199,94 @@ def get_pois_overpass(area_name, city_name, poi_categories):
     # Use a 1km radius
     search_radius = 1000
     
-    for category in poi_categories:
-        # Use a more confined search area with a smaller radius
-        overpass_query = f"""
-        [out:json];
-        (
-          node["amenity"="{category}"](around:{search_radius},{geocode_lat},{geocode_lon});
-          way["amenity"="{category}"](around:{search_radius},{geocode_lat},{geocode_lon});
-          relation["amenity"="{category}"](around:{search_radius},{geocode_lat},{geocode_lon});
-        );
-        out center;
-        """
-        
-        try:
-            response = requests.post(overpass_url, data=overpass_query)
+    # One named set per category in a single query so the whole search costs one
+    # round trip; each set is output separately so it can be capped on its own
+    category_sets = "\n".join(
+        f'{"node" if category in NODE_ONLY_CATEGORIES else "nwr"}'
+        f'["amenity"="{category}"](around:{search_radius},{geocode_lat},{geocode_lon})->.{category};'
+        for category in poi_categories
+    )
+    # Counts come first, one per category in order, so the true totals survive
+    # the per-category cap on returned elements
+    category_counts = "\n".join(f".{category} out count;" for category in poi_categories)
+    category_outputs = "\n".join(
+        f".{category} out center tags {MAX_POIS_PER_CATEGORY};"
+        for category in poi_categories
+    )
+    overpass_query = f"""
+    [out:json];
+    {category_sets}
+    {category_counts}
+    {category_outputs}
+    """
+    
+    try:
+        async with get_http_session().post(overpass_url, data=overpass_query) as response:
             response.raise_for_status()
-            data = response.json()
-            
-            # Extract POIs
-            pois = []
-            for element in data.get('elements', []):
-                # Get coordinates (either directly or from center)
-                if element['type'] == 'node':
-                    lat, lon = element.get('lat'), element.get('lon')
-                else:  # way or relation
-                    center = element.get('center', {})
-                    lat, lon = center.get('lat'), center.get('lon')
-                
-                if lat and lon:
-                    # Calculate distance from center point (in meters)
-                    # This is a simple approximation using the Haversine formula
-                    R = 6371000  # Earth radius in meters
-                    dlat = abs(lat - geocode_lat) * (3.14159/180)
-                    dlon = abs(lon - geocode_lon) * (3.14159/180)
-                    a = (dlat/2) * (dlat/2) + math.cos(lat * 3.14159/180) * math.cos(geocode_lat * 3.14159/180) * (dlon/2) * (dlon/2)
-                    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                    distance = R * c
-                    
-                    # Only include POIs within the 1km radius
-                    if distance <= 1000:
-                        pois.append({
-                            'lat': lat,
-                            'lon': lon,
-                            'tags': element.get('tags', {}),
-                            'distance': round(distance)  # Include distance in meters
-                        })
-            
-            if pois:
-                all_pois[category] = pois
-                
-        except Exception as e:
-            print(f"Error fetching {category} POIs: {str(e)}")
+            data = orjson.loads(await response.read())
+    except Exception as e:
+        # One query covers every category, so a failure here would otherwise
+        # silently empty all of them
+        print(f"Overpass Error: {str(e)}")
+        return {"error": f"Overpass request failed: {str(e)}"}
+    
+    # Total matches per category, from the count elements in query order
+    count_elements = [element for element in data.get('elements', []) if element['type'] == 'count']
+    poi_totals = {
+        category: int(element['tags']['total'])
+        for category, element in zip(poi_categories, count_elements)
+        if int(element['tags']['total'])
+    }
+    
+    # Extract POIs, bucketed by their amenity tag
+    elements = []
+    for element in data.get('elements', []):
+        tags = element.get('tags', {})
+        category = tags.get('amenity')
+        if category not in poi_categories:
+            continue
+        
+        # Get coordinates (either directly or from center)
+        if element['type'] == 'node':
+            lat, lon = element.get('lat'), element.get('lon')
+        else:  # way or relation
+            center = element.get('center', {})
+            lat, lon = center.get('lat'), center.get('lon')
+        
+        if lat and lon:
+            elements.append((category, lat, lon, tags, element['type'] == 'node'))
+    
+    if elements:
+        # Calculate distance from center point (in meters) for all POIs at once
+        # using the Haversine formula
+        R = 6371000  # Earth radius in meters
+        lats = np.fromiter((e[1] for e in elements), dtype=np.float64, count=len(elements))
+        lons = np.fromiter((e[2] for e in elements), dtype=np.float64, count=len(elements))
+        # The center latitude is the same for every POI, so convert it once as a scalar
+        lat0 = math.radians(geocode_lat)
+        cos_lat0 = math.cos(lat0)
+        lats_rad = np.radians(lats)
+        dlat = lats_rad - lat0
+        dlon = np.radians(lons - geocode_lon)
+        a = np.sin(dlat * 0.5)**2 + cos_lat0 * np.cos(lats_rad) * np.sin(dlon * 0.5)**2
+        # Clamp a to 1.0 so rounding near antipodal points can't push arcsin out of domain
+        distances = 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        
+        # around: already bounds nodes to the search radius, but it matches a way or
+        # relation if any part of it is inside, while the distance is measured to its
+        # center; only those need the radius check
+        is_node = np.fromiter((e[4] for e in elements), dtype=bool, count=len(elements))
+        keep = is_node | (distances <= search_radius)
+        rounded = distances.round().astype(int).tolist()
+        for index in np.flatnonzero(keep).tolist():
+            category, lat, lon, tags, _ = elements[index]
+            distance = rounded[index]
+            all_pois.setdefault(category, []).append({
+                'lat': lat,
+                'lon': lon,
+                'tags': tags,
+                'distance': distance  # Include distance in meters
+            })
     
     return {
         "pois": all_pois,
@@ -129,65 +295,30 @@ def get_pois_overpass(area_name, city_name, poi_categories):
             "lon": geocode_lon,
             "display_name": geocode_data[0].get('display_name', '')
         },
-        "bbox": bbox
+        "bbox": bbox,
+        # Per-category totals; "pois" holds at most MAX_POIS_PER_CATEGORY of each
+        "totals": poi_totals,
+        # Overpass reports runtime errors (e.g. timeouts) in "remark" alongside
+        # an HTTP 200 and whatever partial results it had
+        "complete": not data.get('remark')
     }
 
-def generate_complete_geojson(area_name, city_name, pois_data, bbox):
-    """Generate a complete GeoJSON with boundary polygon and POIs using LLM."""
-    
-    # Create a prompt for the LLM to generate the GeoJSON
-    prompt = f"""
-    Create a complete GeoJSON FeatureCollection for {area_name}, {city_name} that includes:
-    
-    1. A boundary polygon feature with these properties:
-       - type: "boundary"
-       - name: "{area_name}, {city_name}"
-       - fillColor: "#0070f3"
-       - fillOpacity: 0.2
-       - strokeColor: "#0070f3"
-       - strokeWidth: 2
-    
-    2. Point features for each POI in this data:
-    {json.dumps(pois_data, indent=2)}
-    
-    The boundary should be a simple polygon that covers the bounding box: {bbox}
-    [west, south, east, north] = {bbox}
-    
-    Each POI should have these properties:
-    - type: "poi"
-    - category: (the POI category)
-    - name: (the POI name if available, otherwise use the category)
-    - color: (assign a unique color to each category)
-    
-    Return ONLY valid GeoJSON with no additional text or explanations.
-    The response must be a complete, valid GeoJSON FeatureCollection.
-    """
-    
-    try:
-        response = model.generate_content(prompt)
-        
-        # Extract JSON from the response
-        json_start = response.text.find('{')
-        json_end = response.text.rfind('}') + 1
-        
-        if json_start == -1 or json_end == -1:
-            # If no JSON found, create a basic GeoJSON with just the boundary
-            return create_basic_geojson(bbox, area_name, city_name, pois_data)
-            
-        json_str = response.text[json_start:json_end]
-        
-        try:
-            geojson = json.loads(json_str)
-            # Validate basic GeoJSON structure
-            if geojson.get('type') != 'FeatureCollection' or 'features' not in geojson:
-                return create_basic_geojson(bbox, area_name, city_name, pois_data)
-            return geojson
-        except json.JSONDecodeError:
-            return create_basic_geojson(bbox, area_name, city_name, pois_data)
-            
-    except Exception as e:
-        print(f"Error generating GeoJSON: {str(e)}")
-        return create_basic_geojson(bbox, area_name, city_name, pois_data)
+def poi_feature(poi, category, color):
+    """Build a GeoJSON Point feature for a single POI."""
+    lat, lon, tags = poi['lat'], poi['lon'], poi['tags']
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [lon, lat]
+        },
+        "properties": {
+            "type": "poi",
+            "category": category,
+            "name": tags.get('name', category),
+            "color": color
+        }
+    }
 
 # Add this function at the module level, before it's called
 def generate_boundary_geojson(area_name, city_name, bbox):
@@ -227,7 +358,7 @@ def generate_boundary_geojson(area_name, city_name, bbox):
 
 # Then fix the create_basic_geojson function to remove the nested definition
 def create_basic_geojson(bbox, area_name, city_name, pois_data):
-    """Create a basic GeoJSON with boundary and POIs as fallback."""
+    """Create a basic GeoJSON with boundary and POIs."""
     # Create boundary polygon from bbox
     boundary_coords = [
         [bbox[0], bbox[1]],  # Southwest
@@ -260,96 +391,52 @@ def create_basic_geojson(bbox, area_name, city_name, pois_data):
     }
     
     # Add POI features
-    colors = ["#0088FE", "#00C49F", "#FFBB28", "#FF8042", "#AF19FF", "#FF1919"]
-    color_index = 0
-    
-    for category, pois in pois_data.items():
-        color = colors[color_index % len(colors)]
-        color_index += 1
-        
-        for poi in pois:
-            if poi.get('lat') and poi.get('lon'):
-                geojson["features"].append({
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [poi['lon'], poi['lat']]
-                    },
-                    "properties": {
-                        "type": "poi",
-                        "category": category,
-                        "name": poi.get('tags', {}).get('name', category),
-                        "color": color
-                    }
-                })
+    features = geojson["features"]
+    for color_index, (category, pois) in enumerate(pois_data.items()):
+        color = CATEGORY_PALETTE[color_index % len(CATEGORY_PALETTE)]
+        features.extend(poi_feature(poi, category, color) for poi in pois if poi['lat'] and poi['lon'])
     
     return geojson
 
 def generate_pois_geojson(area_name, city_name, pois_data):
     """Generate a GeoJSON with just POI points."""
-    # Create the GeoJSON structure
-    geojson = {
-        "type": "FeatureCollection",
-        "features": []
-    }
-    
     # Add POI features with color coding
-    colors = {
-        "hospital": "#0088FE",
-        "school": "#00C49F", 
-        "pharmacy": "#FFBB28",
-        "restaurant": "#FF8042",
-        "cafe": "#AF19FF",
-        "bank": "#FF1919",
-        "atm": "#17BECF",
-        "supermarket": "#9467BD",
-        "grocery": "#D62728",
-        "bus_stop": "#2CA02C",
-        "train_station": "#E377C2",
-        "park": "#7F7F7F",
-        "playground": "#BCBD22",
-        "post_office": "#8C564B"
-    }
-    
+    features = []
     for category, pois in pois_data.items():
-        color = colors.get(category, "#000000")  # Default black if category not in colors
-        
-        for poi in pois:
-            if poi.get('lat') and poi.get('lon'):
-                geojson["features"].append({
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [poi['lon'], poi['lat']]
-                    },
-                    "properties": {
-                        "type": "poi",
-                        "category": category,
-                        "name": poi.get('tags', {}).get('name', category),
-                        "color": color
-                    }
-                })
+        color = COLORS_BY_CATEGORY.get(category, DEFAULT_POI_COLOR)  # Default black if category not in colors
+        features.extend(poi_feature(poi, category, color) for poi in pois if poi['lat'] and poi['lon'])
     
-    return geojson
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+class AreaRequest(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    city: str = Field(min_length=1)
+    area: str = Field(min_length=1)
 
 @app.post("/analyze-area")
-async def analyze_area(area_request: dict):
-    city_name = area_request.get('city')
-    area_name = area_request.get('area')
+async def analyze_area(area_request: AreaRequest):
+    city_name = area_request.city
+    area_name = area_request.area
     full_area_name = f"{area_name}, {city_name}"
 
     print(f"\n=== Starting Analysis for: {full_area_name} ===")
 
-    poi_categories = [
-        "school", "hospital", "pharmacy", "supermarket", "grocery",
-        "restaurant", "cafe", "bar", "pub", "bus_stop", "train_station",
-        "park", "playground", "bank", "atm", "post_office"
-    ]
-
     try:
+        cache_key = f"analyze:v2:{area_name.lower()}:{city_name.lower()}"
+        cached_results = await get_cached_analysis(cache_key)
+        if cached_results is not None:
+            print("\nServing cached analysis")
+            async def stream_cached():
+                yield cached_results
+            return StreamingResponse(stream_cached(), media_type="application/x-ndjson")
+
         # Get POIs from Overpass API
         print("\n[1/3] Getting POIs from Overpass...")
-        overpass_pois_data = get_pois_overpass(area_name, city_name, poi_categories)
+        overpass_pois_data = await get_pois_overpass(area_name, city_name, POI_CATEGORIES)
 
         if "error" in overpass_pois_data:
             print(f"Error fetching POIs from Overpass: {overpass_pois_data['error']}")
@@ -358,6 +445,7 @@ async def analyze_area(area_request: dict):
         categorized_pois = overpass_pois_data['pois']
         geocode = overpass_pois_data['geocode']
         bbox = overpass_pois_data.get('bbox')
+        poi_totals = overpass_pois_data['totals']
         
         # Generate GeoJSON with just POIs
         print("\n[2/3] Generating POIs GeoJSON...")
@@ -365,51 +453,71 @@ async def analyze_area(area_request: dict):
         
         # Prepare analysis prompt
         print("\n[3/3] Preparing analysis prompt...")
-        analysis_prompt = f"""
-        You are a expert location analyser for people to move in there. Analyze the living potential of {full_area_name} based on these categorized Points of Interest (POIs):
-        {json.dumps(categorized_pois, indent=2)}
-        Focus on the following aspects which are important for living standards and dont be strict whatever data you get analyze that and provide your opnion and analysis based on that.
-        
-        Provide a structured JSON response with the following keys:
-        - "summary":(in simple text) A concise summary of the living potential of the area, highlighting the strengths and weaknesses in each category.
-        - "pie_chart_data": Data suitable for a pie chart visualizing the distribution of POI types. Include "name" and "value" for each category. Example: [{{"name": "Residential", "value": 30}}, {{"name": "Commercial", "value": 70}}]
-        - "ai_rating": A numerical rating from 0 to 100 representing how well this area functions as a "15-minute city" where residents can access most daily needs within a 15-minute walk or bike ride.
-        
-        IMPORTANT: Only return the raw JSON, no additional text or explanations. The response must start with '{{' and end with '}}'."""
+        # Send the LLM per-category counts and a few sample names rather than every
+        # POI's full tag dict; prompt size drives LLM latency
+        summary_input = {
+            category: {
+                'count': poi_totals.get(category, len(pois)),
+                'names': [poi['tags']['name'] for poi in pois[:5] if poi['tags'].get('name')],
+                'avg_distance': sum(poi['distance'] for poi in pois) // len(pois)
+            }
+            for category, pois in categorized_pois.items()
+        }
+        analysis_prompt = ANALYSIS_PROMPT_TEMPLATE.substitute(
+            area=full_area_name,
+            pois=orjson.dumps(summary_input).decode()
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Unexpected Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
+    async def stream_results():
+        # The POI data is ready now, so send it before waiting on the LLM
+        pois_line = orjson.dumps({
+            "stage": "pois",
+            "geocode": geocode,
+            "bbox": bbox,
+            "geojson": pois_geojson,  # Include only the POIs GeoJSON
+            "pois": categorized_pois  # Keep the POIs separate for the frontend
+        }) + b"\n"
+        yield pois_line
 
         # Get analysis
         try:
-            response = model.generate_content(analysis_prompt)
+            response_text = await generate_analysis_text(analysis_prompt)
             
-            # Extract JSON from the response
-            json_start = response.text.find('{')
-            json_end = response.text.rfind('}') + 1
+            # Extract JSON from the response, decoding from the first '{' up to the
+            # end of that object (any trailing text is ignored)
+            json_start = response_text.find('{')
             
-            if json_start == -1 or json_end == -1:
+            if json_start == -1:
                 raise ValueError("No JSON found in the response")
                 
-            json_str = response.text[json_start:json_end]
-            analysis_results = json.loads(json_str)
+            analysis_results, _ = JSON_DECODER.raw_decode(response_text, json_start)
             
-            # Combine all results
-            final_results = {
+            analysis_line = orjson.dumps({
+                "stage": "analysis",
                 "summary": analysis_results.get("summary", ""),
                 "pie_chart_data": analysis_results.get("pie_chart_data", []),
-                "ai_rating": analysis_results.get("ai_rating", 0),
-                "geocode": geocode,
-                "bbox": bbox,
-                "geojson": pois_geojson,  # Include only the POIs GeoJSON
-                "pois": categorized_pois  # Keep the POIs separate for the frontend
-            }
-            
-            return final_results
+                "ai_rating": analysis_results.get("ai_rating", 0)
+            }) + b"\n"
+            yield analysis_line
             
         except Exception as e:
+            # Headers are already sent, so report the failure in the stream itself
             print(f"LLM API Error: {str(e)}")
-            raise HTTPException(status_code=502, detail=f"LLM API Error: {str(e)}")
-    except Exception as e:
-        print(f"Unexpected Error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+            yield orjson.dumps({"stage": "error", "detail": f"LLM API Error: {str(e)}"}) + b"\n"
+            return
+
+        # Only cache analyses built on a full POI result
+        if overpass_pois_data['complete']:
+            await cache_analysis(cache_key, pois_line + analysis_line)
+        else:
+            print("Overpass returned partial results, not caching analysis")
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,4 @@
 import React, { useState } from 'react';
-import axios from 'axios';
 import Mapview from './components/Mapview';
 import { PieChart, Pie, Cell, Tooltip, ResponsiveContainer } from 'recharts';
 import './App.css';
@@ -18,28 +17,71 @@ function App() {
   // Colors for the pie chart
   const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#AF19FF', '#FF1919'];
 
+  // Read the newline-delimited JSON stream from /analyze-area, handing each part
+  // to onPart as soon as it arrives
+  const readAnalysisStream = async (response, onPart) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const lines = buffer.split('\n');
+      buffer = lines.pop();
+      for (const line of lines) {
+        if (line.trim()) onPart(JSON.parse(line));
+      }
+    }
+  };
+
   const handleSearch = async () => {
     setLoading(true);
     setError(null);
+    setAnalysis(null);
+    let poisShown = false;
     try {
-      const response = await axios.post('http://localhost:8000/analyze-area', {
-        city: city,
-        area: area
+      const response = await fetch('http://localhost:8000/analyze-area', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ city: city, area: area })
       });
-      console.log("Analysis response:", response.data);
-      
-      setAnalysis(response.data);
-      setResults({
-        pois: response.data.pois || {},
-        geocode: response.data.geocode || {},
-        bbox: response.data.bbox || null,
-        boundary_polygon: response.data.boundary_polygon || null,
-        geojson: response.data.geojson || null  // Add support for the new geojson field
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || 'An error occurred while fetching data.');
+      }
+
+      await readAnalysisStream(response, (part) => {
+        console.log(`Analysis ${part.stage}:`, part);
+        if (part.stage === 'error') {
+          // The POIs are already on screen; keep them and report the failure
+          // in the analysis panel
+          setError(part.detail);
+          setLoading(false);
+        } else if (part.stage === 'pois') {
+          poisShown = true;
+          // Show the POIs on the map right away; the analysis panel keeps
+          // its spinner until the LLM analysis arrives
+          setResults({
+            pois: part.pois || {},
+            geocode: part.geocode || {},
+            bbox: part.bbox || null,
+            boundary_polygon: part.boundary_polygon || null,
+            geojson: part.geojson || null  // Add support for the new geojson field
+          });
+          setShowAnalysis(true);
+        } else if (part.stage === 'analysis') {
+          setAnalysis(part);
+          setLoading(false);
+        }
       });
-      setShowAnalysis(true);
     } catch (error) {
       console.error('Error fetching data:', error);
-      setError(error.response?.data?.detail || 'An error occurred while fetching data.');
+      setError(error.message || 'An error occurred while fetching data.');
+      // Only fall back to the input panel if nothing has been shown yet
+      if (!poisShown) setShowAnalysis(false);
     } finally {
       setLoading(false);
     }
@@ -115,6 +157,8 @@ function App() {
                 <div className="loading-spinner"></div>
                 <p>Analyzing area data...</p>
               </div>
+            ) : error ? (
+              <div className="error-message">{error}</div>
             ) : (
               <div className="analysis-panel-content">
                 <div className="score-container">